@@ -0,0 +1,220 @@
+"""
+Замеры производительности основных операций Game и Board на наборе характерных позиций.
+
+Для каждой пары (операция, позиция) выводятся количество операций в секунду,
+медиана (p50) и 99-й перцентиль (p99) времени одного вызова в микросекундах.
+Перед каждым вызовом кеш позиций очищается, поэтому замеряется полное вычисление.
+Результаты можно сохранить как базовые и сравнивать с ними последующие запуски:
+сравнение завершается с кодом 1, если медиана выросла больше допустимого порога.
+
+Пример запуска:
+    python benchmark.py --save-baseline bench_baseline.json
+    python benchmark.py --baseline bench_baseline.json --threshold 0.2
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+from chess_class import Game
+
+# Набор позиций: начало партии, насыщенный миттельшпиль, малофигурный эндшпиль
+# и позиция с шахом незадолго до мата
+POSITIONS = {
+    'opening': "r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w - - 2 3",
+    'middlegame': "r2q1rk1/pp1nbppp/2p1pn2/3p4/2PP4/2N1PN2/PPQ2PPP/R1B1KB1R w - - 0 9",
+    'endgame': "8/5k2/8/3K4/8/2P5/8/6r1 w - - 0 50",
+    'near_mate': "3R2k1/5pp1/7p/8/8/8/5PPP/6K1 b - - 0 30",
+}
+
+# Длина партии для замеров сохранения и загрузки
+SAVED_GAME_PLIES = 80
+
+
+def king_square(game, color):
+    """Возвращает клетку короля указанного цвета в шахматной нотации."""
+    king = 'K' if color == 'white' else 'k'
+    for i in range(8):
+        for j in range(8):
+            if game.board.board[i][j] == king:
+                return game.board.format_position(i, j)
+
+
+def random_game(plies, seed=1):
+    """
+    Разыгрывает партию из случайных легальных ходов для замеров сохранения и загрузки.
+
+    Возвращает:
+        Game: Игра с историей ходов.
+    """
+    rng = random.Random(seed)
+    game = Game()
+    for _ in range(plies):
+        moves = game.legal_moves()
+        if not moves:
+            break
+        game.board.make_move(*rng.choice(moves))
+        game.turn = 'black' if game.turn == 'white' else 'white'
+        game.move_count += 1
+    return game
+
+
+def position_operations(fen):
+    """
+    Готовит замеряемые операции для позиции.
+
+    Параметры:
+        fen (str): Позиция в нотации FEN.
+
+    Возвращает:
+        dict: Словарь {название операции: функция без аргументов}.
+    """
+    game = Game()
+    game.set_fen(fen)
+    move = game.legal_moves()[0]
+    king = king_square(game, game.turn)
+
+    def make_undo():
+        game.board.make_move(*move)
+        game.board.undo_move()
+
+    return {
+        'is_valid_move': lambda: game.is_valid_move(*move),
+        'is_check': lambda: game.is_check(game.turn),
+        'is_checkmate': lambda: game.is_checkmate(game.turn),
+        'hint': lambda: game.hint(move[0]),
+        'threats': lambda: game.threats(king),
+        'make_undo_move': make_undo,
+    }, game
+
+
+def measure(operation, cache, min_time, min_calls):
+    """
+    Многократно вызывает операцию с очисткой кеша перед каждым вызовом.
+
+    Параметры:
+        operation (callable): Замеряемая операция.
+        cache (PositionCache): Кеш, который очищается перед вызовом, или None.
+        min_time (float): Наименьшее суммарное время замера в секундах.
+        min_calls (int): Наименьшее количество вызовов.
+
+    Возвращает:
+        dict: Количество вызовов, операций в секунду, p50 и p99 в микросекундах.
+    """
+    operation()  # Прогрев
+    samples = []
+    total = 0
+    while total < min_time * 1e9 or len(samples) < min_calls:
+        if cache is not None:
+            cache.clear()
+        start = time.perf_counter_ns()
+        operation()
+        elapsed = time.perf_counter_ns() - start
+        samples.append(elapsed)
+        total += elapsed
+    samples.sort()
+    return {
+        'calls': len(samples),
+        'ops_per_sec': round(len(samples) / (total / 1e9), 1),
+        'p50_us': round(samples[len(samples) // 2] / 1e3, 2),
+        'p99_us': round(samples[min(len(samples) - 1, int(len(samples) * 0.99))] / 1e3, 2),
+    }
+
+
+def run_benchmarks(min_time=0.2, min_calls=20, only=None):
+    """
+    Выполняет все замеры.
+
+    Параметры:
+        min_time (float): Наименьшее время замера одной операции в секундах.
+        min_calls (int): Наименьшее количество вызовов одной операции.
+        only (str): Подстрока, по которой отбираются замеры (например, "hint").
+
+    Возвращает:
+        dict: Результаты по ключам вида "операция/позиция".
+    """
+    results = {}
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for name, fen in POSITIONS.items():
+            operations, game = position_operations(fen)
+            for operation_name, operation in operations.items():
+                key = f"{operation_name}/{name}"
+                if only is None or only in key:
+                    results[key] = measure(operation, game.cache, min_time, min_calls)
+
+        game = random_game(SAVED_GAME_PLIES)
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'game.txt')
+            game.save_game(filename)
+            operations = {
+                'save_game': lambda: game.save_game(filename),
+                'load_game': lambda: Game().load_game(filename),
+                'load_game_at': lambda: Game().load_game_at(filename, len(game.board.move_history) // 2),
+            }
+            for operation_name, operation in operations.items():
+                key = f"{operation_name}/{len(game.board.move_history)}_plies"
+                if only is None or only in key:
+                    results[key] = measure(operation, None, min_time, min_calls)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """
+    Сравнивает медианы с базовыми результатами.
+
+    Параметры:
+        results (dict): Текущие результаты.
+        baseline (dict): Базовые результаты.
+        threshold (float): Допустимый относительный рост медианы (0.2 — на 20%).
+
+    Возвращает:
+        dict: Замеры, медиана которых выросла больше порога, с базовым и текущим значением.
+    """
+    regressions = {}
+    for key, current in results.items():
+        previous = baseline.get(key)
+        if previous and current['p50_us'] > previous['p50_us'] * (1 + threshold):
+            regressions[key] = {
+                'baseline_p50_us': previous['p50_us'],
+                'p50_us': current['p50_us'],
+                'change': round(current['p50_us'] / previous['p50_us'] - 1, 3),
+            }
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Замеры производительности основных операций игры.")
+    parser.add_argument('--min-time', type=float, default=0.2, help="Наименьшее время замера одной операции в секундах")
+    parser.add_argument('--min-calls', type=int, default=20, help="Наименьшее количество вызовов одной операции")
+    parser.add_argument('--only', help="Выполнять только замеры, в названии которых есть эта подстрока")
+    parser.add_argument('--baseline', help="Файл с базовыми результатами для сравнения")
+    parser.add_argument('--threshold', type=float, default=0.2, help="Допустимый относительный рост медианы")
+    parser.add_argument('--save-baseline', help="Сохранить результаты как базовые в указанный файл")
+    args = parser.parse_args()
+
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': run_benchmarks(args.min_time, args.min_calls, args.only),
+    }
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)['results']
+        report['threshold'] = args.threshold
+        report['regressions'] = compare(report['results'], baseline, args.threshold)
+
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as file:
+            json.dump(report, file, indent=2, ensure_ascii=False)
+    if report.get('regressions'):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
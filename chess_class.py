@@ -1,3 +1,217 @@
+import copy
+import os
+import random
+import threading
+from collections import OrderedDict
+
+# Стоимость фигур для миттельшпиля и эндшпиля (в сантипешках)
+MG_VALUES = {'p': 100, 'n': 320, 'b': 330, 'r': 500, 'q': 900, 'k': 0}
+EG_VALUES = {'p': 120, 'n': 300, 'b': 320, 'r': 520, 'q': 920, 'k': 0}
+
+# Через сколько полуходов save_game записывает контрольную позицию
+CHECKPOINT_INTERVAL = 16
+
+# Стоимость фигур для статической оценки разменов (SEE)
+SEE_VALUES = {'p': 100, 'n': 320, 'b': 330, 'r': 500, 'q': 900, 'k': 20000}
+
+# Вклад фигур в фазу игры: 24 — полный набор фигур, 0 — чистый эндшпиль
+PHASE_WEIGHTS = {'p': 0, 'n': 1, 'b': 1, 'r': 2, 'q': 4, 'k': 0}
+MAX_PHASE = 24
+
+# Таблицы позиционных бонусов с точки зрения белых.
+# Строка 0 соответствует 8-й горизонтали, как и в Board.board.
+PST_MG = {
+    'p': [
+        [  0,   0,   0,   0,   0,   0,   0,   0],
+        [ 50,  50,  50,  50,  50,  50,  50,  50],
+        [ 10,  10,  20,  30,  30,  20,  10,  10],
+        [  5,   5,  10,  25,  25,  10,   5,   5],
+        [  0,   0,   0,  20,  20,   0,   0,   0],
+        [  5,  -5, -10,   0,   0, -10,  -5,   5],
+        [  5,  10,  10, -20, -20,  10,  10,   5],
+        [  0,   0,   0,   0,   0,   0,   0,   0],
+    ],
+    'n': [
+        [-50, -40, -30, -30, -30, -30, -40, -50],
+        [-40, -20,   0,   0,   0,   0, -20, -40],
+        [-30,   0,  10,  15,  15,  10,   0, -30],
+        [-30,   5,  15,  20,  20,  15,   5, -30],
+        [-30,   0,  15,  20,  20,  15,   0, -30],
+        [-30,   5,  10,  15,  15,  10,   5, -30],
+        [-40, -20,   0,   5,   5,   0, -20, -40],
+        [-50, -40, -30, -30, -30, -30, -40, -50],
+    ],
+    'b': [
+        [-20, -10, -10, -10, -10, -10, -10, -20],
+        [-10,   0,   0,   0,   0,   0,   0, -10],
+        [-10,   0,   5,  10,  10,   5,   0, -10],
+        [-10,   5,   5,  10,  10,   5,   5, -10],
+        [-10,   0,  10,  10,  10,  10,   0, -10],
+        [-10,  10,  10,  10,  10,  10,  10, -10],
+        [-10,   5,   0,   0,   0,   0,   5, -10],
+        [-20, -10, -10, -10, -10, -10, -10, -20],
+    ],
+    'r': [
+        [  0,   0,   0,   0,   0,   0,   0,   0],
+        [  5,  10,  10,  10,  10,  10,  10,   5],
+        [ -5,   0,   0,   0,   0,   0,   0,  -5],
+        [ -5,   0,   0,   0,   0,   0,   0,  -5],
+        [ -5,   0,   0,   0,   0,   0,   0,  -5],
+        [ -5,   0,   0,   0,   0,   0,   0,  -5],
+        [ -5,   0,   0,   0,   0,   0,   0,  -5],
+        [  0,   0,   0,   5,   5,   0,   0,   0],
+    ],
+    'q': [
+        [-20, -10, -10,  -5,  -5, -10, -10, -20],
+        [-10,   0,   0,   0,   0,   0,   0, -10],
+        [-10,   0,   5,   5,   5,   5,   0, -10],
+        [ -5,   0,   5,   5,   5,   5,   0,  -5],
+        [  0,   0,   5,   5,   5,   5,   0,  -5],
+        [-10,   5,   5,   5,   5,   5,   0, -10],
+        [-10,   0,   5,   0,   0,   0,   0, -10],
+        [-20, -10, -10,  -5,  -5, -10, -10, -20],
+    ],
+    'k': [
+        [-30, -40, -40, -50, -50, -40, -40, -30],
+        [-30, -40, -40, -50, -50, -40, -40, -30],
+        [-30, -40, -40, -50, -50, -40, -40, -30],
+        [-30, -40, -40, -50, -50, -40, -40, -30],
+        [-20, -30, -30, -40, -40, -30, -30, -20],
+        [-10, -20, -20, -20, -20, -20, -20, -10],
+        [ 20,  20,   0,   0,   0,   0,  20,  20],
+        [ 20,  30,  10,   0,   0,  10,  30,  20],
+    ],
+}
+
+# В эндшпиле ценятся проходные пешки и активный король,
+# для остальных фигур используются таблицы миттельшпиля
+PST_EG = dict(PST_MG)
+PST_EG['p'] = [
+    [  0,   0,   0,   0,   0,   0,   0,   0],
+    [ 80,  80,  80,  80,  80,  80,  80,  80],
+    [ 50,  50,  50,  50,  50,  50,  50,  50],
+    [ 30,  30,  30,  30,  30,  30,  30,  30],
+    [ 20,  20,  20,  20,  20,  20,  20,  20],
+    [ 10,  10,  10,  10,  10,  10,  10,  10],
+    [ 10,  10,  10,  10,  10,  10,  10,  10],
+    [  0,   0,   0,   0,   0,   0,   0,   0],
+]
+PST_EG['k'] = [
+    [-50, -40, -30, -20, -20, -30, -40, -50],
+    [-30, -20, -10,   0,   0, -10, -20, -30],
+    [-30, -10,  20,  30,  30,  20, -10, -30],
+    [-30, -10,  30,  40,  40,  30, -10, -30],
+    [-30, -10,  30,  40,  40,  30, -10, -30],
+    [-30, -10,  20,  30,  30,  20, -10, -30],
+    [-30, -30,   0,   0,   0,   0, -30, -30],
+    [-50, -30, -30, -30, -30, -30, -30, -50],
+]
+
+
+def build_square_scores():
+    """
+    Заранее вычисляет оценку (миттельшпиль, эндшпиль) каждой фигуры на каждой клетке.
+    Оценка черных фигур берется из зеркальной строки таблицы со знаком минус,
+    поэтому итоговая сумма всегда считается с точки зрения белых.
+
+    Возвращает:
+        dict: Словарь {символ фигуры: двумерный список 8x8 кортежей (mg, eg)}.
+    """
+    scores = {}
+    for kind in MG_VALUES:
+        for symbol, sign in ((kind.upper(), 1), (kind, -1)):
+            scores[symbol] = [
+                [
+                    (sign * (MG_VALUES[kind] + PST_MG[kind][row if sign > 0 else 7 - row][col]),
+                     sign * (EG_VALUES[kind] + PST_EG[kind][row if sign > 0 else 7 - row][col]))
+                    for col in range(8)
+                ]
+                for row in range(8)
+            ]
+    return scores
+
+
+SQUARE_SCORES = build_square_scores()
+
+
+def build_zobrist_keys(seed=20240601):
+    """
+    Генерирует случайные 64-битные ключи Зобриста для каждой фигуры на каждой клетке.
+    Генератор инициализируется фиксированным значением, поэтому хеши позиций
+    совпадают между запусками и процессами.
+
+    Возвращает:
+        tuple: Словарь {символ фигуры: двумерный список 8x8 ключей} и ключ хода черных.
+    """
+    rng = random.Random(seed)
+    keys = {}
+    for symbol in 'PNBRQKpnbrqk':
+        keys[symbol] = [[rng.getrandbits(64) for _ in range(8)] for _ in range(8)]
+    return keys, rng.getrandbits(64)
+
+
+ZOBRIST_KEYS, ZOBRIST_BLACK_TO_MOVE = build_zobrist_keys()
+
+
+class PositionCache:
+    def __init__(self, maxsize=4096):
+        """
+        Кеш результатов анализа позиций (легальные ходы, угрозы, шах и мат)
+        с вытеснением давно не использованных записей. Ключ записи начинается
+        с хеша позиции с учетом очереди хода, поэтому один кеш можно разделять
+        между несколькими объектами Game, в том числе из разных потоков.
+
+        Параметры:
+            maxsize (int): Наибольшее количество записей.
+        """
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, compute):
+        """
+        Возвращает значение из кеша или вычисляет и запоминает его.
+
+        Параметры:
+            key (tuple): Ключ записи.
+            compute (callable): Функция без аргументов, вычисляющая значение.
+
+        Возвращает:
+            Значение записи.
+        """
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            self.misses += 1
+
+        value = compute()
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            if len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        """Очищает кеш и счетчики."""
+        with self.lock:
+            self.entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """
+        Возвращает:
+            dict: Количество попаданий, промахов и записей в кеше.
+        """
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self.entries)}
+
+
 class Board:
     def __init__(self):
         """
@@ -7,6 +221,10 @@ class Board:
         self.board = self.create_board()
         self.move_history = []
         self.redo_history = []
+        self.base_ply = 0  # Номер полухода, с которого начинается move_history
+        self.custom_start = False  # Партия начата не из начальной расстановки (например, из FEN)
+        self.reset_evaluation()
+        self.reset_hash()
 
     def create_board(self):
         """
@@ -26,6 +244,102 @@ class Board:
             ['R', 'N', 'B', 'Q', 'K', 'B', 'N', 'R']
         ]
 
+    def set_position(self, board, ply=0):
+        """
+        Устанавливает произвольную расстановку фигур, очищая историю ходов.
+
+        Параметры:
+            board (list): Двумерный список 8x8 с расстановкой фигур.
+            ply (int): Номер полухода партии, которому соответствует расстановка.
+        """
+        self.board = [row[:] for row in board]
+        self.move_history = []
+        self.redo_history = []
+        self.base_ply = ply
+        self.reset_evaluation()
+        self.reset_hash()
+
+    def reset_evaluation(self):
+        """
+        Полностью пересчитывает материал, позиционную оценку и фазу игры по всей доске.
+        Вызывается при создании доски и после прямого изменения self.board;
+        в остальных случаях оценка обновляется ходами инкрементально.
+        """
+        self.mg_score = 0
+        self.eg_score = 0
+        self.phase = 0
+        for i in range(8):
+            for j in range(8):
+                piece = self.board[i][j]
+                if piece != '.':
+                    mg, eg = SQUARE_SCORES[piece][i][j]
+                    self.mg_score += mg
+                    self.eg_score += eg
+                    self.phase += PHASE_WEIGHTS[piece.lower()]
+
+    def update_evaluation(self, piece, captured_piece, start_row, start_col, end_row, end_col, sign):
+        """
+        Обновляет оценку по фигурам, участвующим в ходе.
+
+        Параметры:
+            piece (str): Ходившая фигура.
+            captured_piece (str): Взятая фигура или '.'.
+            start_row, start_col (int): Начальная клетка хода.
+            end_row, end_col (int): Конечная клетка хода.
+            sign (int): 1 при выполнении хода, -1 при его отмене.
+        """
+        scores = SQUARE_SCORES[piece]
+        start_mg, start_eg = scores[start_row][start_col]
+        end_mg, end_eg = scores[end_row][end_col]
+        mg = end_mg - start_mg
+        eg = end_eg - start_eg
+        if captured_piece != '.':
+            captured_mg, captured_eg = SQUARE_SCORES[captured_piece][end_row][end_col]
+            mg -= captured_mg
+            eg -= captured_eg
+            self.phase -= sign * PHASE_WEIGHTS[captured_piece.lower()]
+        self.mg_score += sign * mg
+        self.eg_score += sign * eg
+
+    def reset_hash(self):
+        """
+        Полностью пересчитывает хеш Зобриста расстановки фигур.
+        Очередь хода в хеш доски не входит, ее учитывает Game.position_key.
+        """
+        self.hash = 0
+        for i in range(8):
+            for j in range(8):
+                piece = self.board[i][j]
+                if piece != '.':
+                    self.hash ^= ZOBRIST_KEYS[piece][i][j]
+
+    def update_hash(self, piece, captured_piece, start_row, start_col, end_row, end_col):
+        """
+        Обновляет хеш по фигурам, участвующим в ходе. Операция обратима,
+        поэтому одинаково используется при выполнении и отмене хода.
+
+        Параметры:
+            piece (str): Ходившая фигура.
+            captured_piece (str): Взятая фигура или '.'.
+            start_row, start_col (int): Начальная клетка хода.
+            end_row, end_col (int): Конечная клетка хода.
+        """
+        keys = ZOBRIST_KEYS[piece]
+        self.hash ^= keys[start_row][start_col] ^ keys[end_row][end_col]
+        if captured_piece != '.':
+            self.hash ^= ZOBRIST_KEYS[captured_piece][end_row][end_col]
+
+    def evaluate(self):
+        """
+        Возвращает оценку позиции за константное время, смешивая оценки
+        миттельшпиля и эндшпиля пропорционально фазе игры.
+
+        Возвращает:
+            int: Оценка в сантипешках с точки зрения белых.
+        """
+        phase = min(self.phase, MAX_PHASE)
+        return (self.mg_score * phase + self.eg_score * (MAX_PHASE - phase)) // MAX_PHASE
+
     def print_board(self, highlight=[]):
         """
         Выводит текущее состояние доски в консоль.
@@ -60,6 +374,19 @@ class Board:
         row = 8 - int(pos[1])
         return row, col
 
+    def format_position(self, row, col):
+        """
+        Преобразует индексы строки и столбца в шахматную нотацию (например, "e4").
+
+        Параметры:
+            row (int): Индекс строки (0-7).
+            col (int): Индекс столбца (0-7).
+
+        Возвращает:
+            str: Позиция на доске в шахматной нотации.
+        """
+        return f"{chr(col + ord('a'))}{8 - row}"
+
     def make_move(self, start, end):
         """
         Выполняет ход фигуры с позиции start на позицию end.
@@ -79,6 +406,8 @@ class Board:
         # Выполнение хода
         self.board[end_row][end_col] = piece
         self.board[start_row][start_col] = '.'
+        self.update_evaluation(piece, captured_piece, start_row, start_col, end_row, end_col, 1)
+        self.update_hash(piece, captured_piece, start_row, start_col, end_row, end_col)
 
         self.redo_history.clear()
 
@@ -95,6 +424,8 @@ class Board:
             self.board[start_row][start_col] = piece # Возвращаем фигуру на начальную позицию
 
             self.board[end_row][end_col] = captured_piece # Восстанавливаем взятую фигуру
+            self.update_evaluation(piece, captured_piece, start_row, start_col, end_row, end_col, -1)
+            self.update_hash(piece, captured_piece, start_row, start_col, end_row, end_col)
             
             self.redo_history.append((start, end, piece, captured_piece))
 
@@ -110,6 +441,8 @@ class Board:
             
             self.board[end_row][end_col] = piece # Выполнение хода
             self.board[start_row][start_col] = '.'
+            self.update_evaluation(piece, captured_piece, start_row, start_col, end_row, end_col, 1)
+            self.update_hash(piece, captured_piece, start_row, start_col, end_row, end_col)
             
             self.move_history.append((start, end, piece, captured_piece))
 
@@ -159,7 +492,7 @@ class Pawn(Piece):
             if (start_row == 1 or start_row == 6) and start_row + 2 * direction == end_row and board.board[end_row][end_col] == '.' and board.board[start_row + direction][start_col] == '.':
                 return True
         elif abs(start_col - end_col) == 1 and start_row + direction == end_row:
-            if board.board[end_row][end_col] != '.' and board.board[end_row][end_col].islower() != self.color == 'white':
+            if board.board[end_row][end_col] != '.' and board.board[end_row][end_col].islower() == (self.color == 'white'):
                 return True
         return False
     
@@ -196,7 +529,7 @@ class Pawn(Piece):
                 end_row = start_row + direction
                 if 0 <= end_row < 8:
                     target_piece = board.board[end_row][end_col]
-                    if target_piece != '.' and target_piece.islower() != (self.color == 'white'):
+                    if target_piece != '.' and target_piece.islower() == (self.color == 'white'):
                         moves.append(f"{chr(end_col + ord('a'))}{8 - end_row}")
 
         return moves
@@ -220,12 +553,12 @@ class Rook(Piece):
             for col in range(min(start_col, end_col) + 1, max(start_col, end_col)):
                 if board.board[start_row][col] != '.':
                     return False
-            return board.board[end_row][end_col] == '.' or board.board[end_row][end_col].islower() != self.color == 'white'
+            return board.board[end_row][end_col] == '.' or board.board[end_row][end_col].islower() == (self.color == 'white')
         elif start_col == end_col:
             for row in range(min(start_row, end_row) + 1, max(start_row, end_row)):
                 if board.board[row][start_col] != '.':
                     return False
-            return board.board[end_row][end_col] == '.' or board.board[end_row][end_col].islower() != self.color == 'white'
+            return board.board[end_row][end_col] == '.' or board.board[end_row][end_col].islower() == (self.color == 'white')
         return False
 
     def get_possible_moves(self, board):
@@ -249,7 +582,7 @@ class Rook(Piece):
                 if target_piece == '.':
                     moves.append(f"{chr(y + ord('a'))}{8 - x}")
                 else:
-                    if target_piece.islower() != (self.color == 'white'):
+                    if target_piece.islower() == (self.color == 'white'):
                         moves.append(f"{chr(y + ord('a'))}{8 - x}")
                     break
                 x += dx
@@ -272,7 +605,7 @@ class Knight(Piece):
         start_row, start_col = board.parse_position(self.position)
         end_row, end_col = board.parse_position(end)
         if (abs(start_row - end_row) == 2 and abs(start_col - end_col) == 1) or (abs(start_row - end_row) == 1 and abs(start_col - end_col) == 2):
-            return board.board[end_row][end_col] == '.' or board.board[end_row][end_col].islower() != self.color == 'white'
+            return board.board[end_row][end_col] == '.' or board.board[end_row][end_col].islower() == (self.color == 'white')
         return False
 
     def get_possible_moves(self, board):
@@ -293,7 +626,7 @@ class Knight(Piece):
             x, y = start_row + dx, start_col + dy
             if 0 <= x < 8 and 0 <= y < 8:
                 target_piece = board.board[x][y]
-                if target_piece == '.' or target_piece.islower() != (self.color == 'white'):
+                if target_piece == '.' or target_piece.islower() == (self.color == 'white'):
                     moves.append(f"{chr(y + ord('a'))}{8 - x}")
 
         return moves
@@ -321,7 +654,7 @@ class Bishop(Piece):
                     return False
                 row += row_step
                 col += col_step
-            return board.board[end_row][end_col] == '.' or board.board[end_row][end_col].islower() != self.color == 'white'
+            return board.board[end_row][end_col] == '.' or board.board[end_row][end_col].islower() == (self.color == 'white')
         return False
     
     def get_possible_moves(self, board):
@@ -345,7 +678,7 @@ class Bishop(Piece):
                 if target_piece == '.':
                     moves.append(f"{chr(y + ord('a'))}{8 - x}")
                 else:
-                    if target_piece.islower() != (self.color == 'white'):
+                    if target_piece.islower() == (self.color == 'white'):
                         moves.append(f"{chr(y + ord('a'))}{8 - x}")
                     break
                 x += dx
@@ -396,7 +729,7 @@ class King(Piece):
         start_row, start_col = board.parse_position(self.position)
         end_row, end_col = board.parse_position(end)
         if abs(start_row - end_row) <= 1 and abs(start_col - end_col) <= 1:
-            return board.board[end_row][end_col] == '.' or board.board[end_row][end_col].islower() != self.color == 'white'
+            return board.board[end_row][end_col] == '.' or board.board[end_row][end_col].islower() == (self.color == 'white')
         return False
     
     def get_possible_moves(self, board):
@@ -420,19 +753,58 @@ class King(Piece):
                 x, y = start_row + dx, start_col + dy
                 if 0 <= x < 8 and 0 <= y < 8:
                     target_piece = board.board[x][y]
-                    if target_piece == '.' or target_piece.islower() != (self.color == 'white'):
+                    if target_piece == '.' or target_piece.islower() == (self.color == 'white'):
                         moves.append(f"{chr(y + ord('a'))}{8 - x}")
 
         return moves
 
+PIECE_CLASSES = {'p': Pawn, 'r': Rook, 'n': Knight, 'b': Bishop, 'q': Queen, 'k': King}
+
+KNIGHT_OFFSETS = [(-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1)]
+KING_OFFSETS = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
+ROOK_DIRECTIONS = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+BISHOP_DIRECTIONS = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
+
+PROOF_INFINITY = 10 ** 9
+
+class ProofNode:
+    def __init__(self, parent, move, attacker, moves_left, key):
+        """
+        Узел дерева поиска доказательства (proof-number search).
+        В OR-узле ходит атакующая сторона, которой достаточно одного матующего продолжения,
+        в AND-узле защищающаяся сторона, и мат должен следовать после любого ее ответа.
+
+        Параметры:
+            parent (ProofNode): Родительский узел или None для корня.
+            move (tuple): Ход (start, end), ведущий в узел из родителя.
+            attacker (bool): True для OR-узла, False для AND-узла.
+            moves_left (int): Сколько ходов атакующей стороны осталось до предела.
+            key (int): Ключ позиции узла (Game.position_key).
+        """
+        self.parent = parent
+        self.move = move
+        self.attacker = attacker
+        self.moves_left = moves_left
+        self.key = key
+        self.children = None
+        self.proof = 1  # Сколько узлов нужно доказать, чтобы доказать мат
+        self.disproof = 1  # Сколько узлов нужно опровергнуть, чтобы опровергнуть мат
+        self.mate_length = None  # Длина доказанного мата в полуходах
+
 class Game:
-    def __init__(self):
+    def __init__(self, cache=None):
         """
         Инициализирует игру, создавая доску и устанавливая начальные значения.
+
+        Параметры:
+            cache (PositionCache): Кеш анализа позиций. Чтобы повторные запросы
+                к одним и тем же позициям из разных игр не пересчитывались,
+                передайте всем играм один кеш. По умолчанию создается собственный.
         """
         self.board = Board()
         self.turn = 'white'
         self.move_count = 0
+        self.cache = cache if cache is not None else PositionCache()
 
     def play(self):
         """
@@ -440,7 +812,7 @@ class Game:
         """
         while True:
             self.board.print_board()
-            print(f"Ход {'белых' if self.turn == 'white' else 'черных'}. Введите ход (например, e2 e4) или команду (back, next, hint, threats, save, load, exit):")
+            print(f"Ход {'белых' if self.turn == 'white' else 'черных'}. Введите ход (например, e2 e4) или команду (back, next, hint, threats, save, load [полуход], exit):")
             command = input().strip().lower()
             
             if command == 'exit':
@@ -463,8 +835,14 @@ class Game:
                 filename = command.split()[1]
                 self.save_game(filename)
             elif command.startswith('load'):
-                filename = command.split()[1]
-                self.load_game(filename)
+                args = command.split()
+                if len(args) > 2:
+                    if args[2].isdigit():
+                        self.load_game_at(args[1], int(args[2]))
+                    else:
+                        print("Неверный формат команды. Повторите попытку.")
+                else:
+                    self.load_game(args[1])
             else:
                 try:
                     start, end = command.split()
@@ -487,17 +865,97 @@ class Game:
                 except ValueError:
                     print("Неверный формат команды. Повторите попытку.")
 
-    def is_valid_move(self, start, end):
+    def copy(self, cache=None):
+        """
+        Создает независимую копию игры с той же доской, историей ходов и очередью хода.
+
+        Параметры:
+            cache (PositionCache): Кеш анализа позиций для копии. По умолчанию создается
+                собственный, чтобы массовые запросы к копии (например, поиск хода)
+                не вытесняли записи кеша исходной игры.
+
+        Возвращает:
+            Game: Копия игры.
+        """
+        game = Game.__new__(Game)
+        game.board = copy.deepcopy(self.board)
+        game.turn = self.turn
+        game.move_count = self.move_count
+        game.cache = cache if cache is not None else PositionCache()
+        return game
+
+    def set_fen(self, fen):
+        """
+        Устанавливает позицию из нотации FEN. Учитываются расстановка фигур,
+        очередь хода и номер хода; рокировка и взятие на проходе в игре не реализованы
+        и игнорируются.
+
+        Параметры:
+            fen (str): Позиция в нотации FEN.
+        """
+        fields = fen.split()
+        board = []
+        for rank in fields[0].split('/'):
+            row = []
+            for char in rank:
+                if not char.isdigit() and char not in 'PNBRQKpnbrqk':
+                    raise ValueError(f"неверная расстановка в FEN: {fields[0]}")
+                row.extend('.' * int(char) if char.isdigit() else char)
+            board.append(row)
+        if len(board) != 8 or any(len(row) != 8 for row in board):
+            raise ValueError(f"неверная расстановка в FEN: {fields[0]}")
+
+        self.turn = 'black' if len(fields) > 1 and fields[1] == 'b' else 'white'
+        full_move = int(fields[5]) if len(fields) > 5 else 1
+        self.move_count = (full_move - 1) * 2 + (self.turn == 'black')
+        self.board.set_position(board, self.move_count)
+        # Файл партии всегда описывает ходы от начальной расстановки
+        self.board.custom_start = board != self.board.create_board() or self.turn == 'black'
+
+    def fen(self):
+        """
+        Возвращает текущую позицию в нотации FEN.
+
+        Возвращает:
+            str: Позиция в нотации FEN.
+        """
+        ranks = []
+        for row in self.board.board:
+            rank = ''
+            empty = 0
+            for cell in row:
+                if cell == '.':
+                    empty += 1
+                    continue
+                if empty:
+                    rank += str(empty)
+                    empty = 0
+                rank += cell
+            ranks.append(rank + (str(empty) if empty else ''))
+        return f"{'/'.join(ranks)} {self.turn[0]} - - 0 {self.move_count // 2 + 1}"
+
+    def position_key(self):
+        """
+        Возвращает хеш текущей позиции с учетом очереди хода.
+
+        Возвращает:
+            int: 64-битный ключ позиции.
+        """
+        return self.board.hash ^ (ZOBRIST_BLACK_TO_MOVE if self.turn == 'black' else 0)
+
+    def is_valid_move(self, start, end, color=None):
         """
         Проверяет, является ли ход допустимым.
         
         Параметры:
             start (str): Начальная позиция хода.
             end (str): Конечная позиция хода.
+            color (str): Цвет ходящей стороны. По умолчанию — сторона, чей сейчас ход.
             
         Возвращает:
             bool: True, если ход допустим, иначе False.
         """
+        color = color or self.turn
         start_row, start_col = self.board.parse_position(start)
         end_row, end_col = self.board.parse_position(end)
         piece = self.board.board[start_row][start_col]
@@ -505,24 +963,12 @@ class Game:
         if piece == '.':
             return False
         
-        # Проверяем, принадлежит ли фигура текущему игроку
-        if (self.turn == 'white' and piece.islower()) or (self.turn == 'black' and piece.isupper()):
+        # Проверяем, принадлежит ли фигура ходящему игроку
+        if (color == 'white' and piece.islower()) or (color == 'black' and piece.isupper()):
             return False
 
         # Проверяем, является ли ход легальным для данной фигуры
-        is_legal = False
-        if piece.lower() == 'p':
-            is_legal = Pawn('white' if piece.isupper() else 'black', start).is_valid_move(self.board, end)
-        elif piece.lower() == 'r':
-            is_legal = Rook('white' if piece.isupper() else 'black', start).is_valid_move(self.board, end)
-        elif piece.lower() == 'n':
-            is_legal = Knight('white' if piece.isupper() else 'black', start).is_valid_move(self.board, end)
-        elif piece.lower() == 'b':
-            is_legal = Bishop('white' if piece.isupper() else 'black', start).is_valid_move(self.board, end)
-        elif piece.lower() == 'q':
-            is_legal = Queen('white' if piece.isupper() else 'black', start).is_valid_move(self.board, end)
-        elif piece.lower() == 'k':
-            is_legal = King('white' if piece.isupper() else 'black', start).is_valid_move(self.board, end)
+        is_legal = PIECE_CLASSES[piece.lower()](color, start).is_valid_move(self.board, end)
 
         if not is_legal:
             return False
@@ -536,8 +982,8 @@ class Game:
         king_pos = None
         for i in range(8):
             for j in range(8):
-                if (self.turn == 'white' and temp_board[i][j] == 'K') or \
-                   (self.turn == 'black' and temp_board[i][j] == 'k'):
+                if (color == 'white' and temp_board[i][j] == 'K') or \
+                   (color == 'black' and temp_board[i][j] == 'k'):
                     king_pos = (i, j)
                     break
             if king_pos:
@@ -547,7 +993,7 @@ class Game:
         for i in range(8):
             for j in range(8):
                 if temp_board[i][j] != '.' and \
-                   temp_board[i][j].islower() != (self.turn == 'black'):
+                   temp_board[i][j].islower() != (color == 'black'):
                     # Проверяем, может ли фигура атаковать короля
                     if self.is_piece_attacking_king(temp_board, (i, j), king_pos):
                         return False
@@ -638,6 +1084,10 @@ class Game:
 
     def is_check(self, color):
         """Проверяет, находится ли король под шахом"""
+        return self.cache.get((self.position_key(), 'check', color), lambda: self.compute_check(color))
+
+    def compute_check(self, color):
+        """Проверяет шах без обращения к кешу"""
         # Находим позицию короля
         king_pos = None
         for i in range(8):
@@ -667,46 +1117,186 @@ class Game:
         if not self.is_check(color):
             return False
 
-        # Проверяем все возможные ходы всех фигур
+        # Мат, если ни один легальный ход не выводит короля из-под шаха
+        return self.cache.get((self.position_key(), 'mate', color), lambda: not self.legal_moves(color))
+
+    def solve_mate(self, n):
+        """
+        Ищет форсированный мат не более чем в n ходов стороны, чей сейчас ход,
+        поиском числа доказательства (proof-number search). Атакующая сторона
+        перебирает только шахующие ходы, защищающаяся — все ответы. Доказанные
+        и опровергнутые позиции запоминаются по ключу позиции, поэтому перестановки
+        ходов не анализируются повторно. Поиск пользуется собственным кешем позиций,
+        чтобы не вытеснять записи общего кеша игры. Позиция и история ходов после
+        поиска не меняются.
+
+        Параметры:
+            n (int): Наибольшее количество ходов атакующей стороны.
+
+        Возвращает:
+            list: Матующий вариант — список ходов (start, end) обеих сторон,
+            на каждом ходу защиты выбран самый упорный ответ; None, если нет
+            форсированного мата не более чем в n ходов, состоящего только из шахов.
+            Маты с тихими ходами атакующей стороны не находятся: например,
+            в позиции kbK5/pp6/1P6/8/8/8/8/R7 w мат в 2 хода (Ra6 и b7#) не будет найден.
+        """
+        attacker_color = self.turn
+        defender_color = 'black' if attacker_color == 'white' else 'white'
+        proven = {}  # Ключ позиции -> (длина мата в полуходах, лучший ход)
+        disproven = {}  # Ключ позиции -> наибольший предел ходов, при котором мата нет
+        redo_history = self.board.redo_history[:]
+        cache = self.cache
+        self.cache = PositionCache()
+
+        def push(move):
+            self.board.make_move(*move)
+            self.turn = 'black' if self.turn == 'white' else 'white'
+
+        def pop():
+            self.board.undo_move()
+            self.turn = 'black' if self.turn == 'white' else 'white'
+
+        def lookup(node):
+            # Для OR-узла мат в k ходов занимает 2k - 1 полуходов, для AND-узла — 2k
+            limit = 2 * node.moves_left - (1 if node.attacker else 0)
+            if node.key in proven and proven[node.key][0] <= limit:
+                node.proof, node.disproof = 0, PROOF_INFINITY
+                node.mate_length = proven[node.key][0]
+            elif disproven.get(node.key, -1) >= node.moves_left:
+                node.proof, node.disproof = PROOF_INFINITY, 0
+            elif not node.attacker:
+                # Защищающаяся сторона под шахом: без ходов — мат, иначе оцениваем по числу ответов
+                replies = len(self.legal_moves(defender_color))
+                if not replies:
+                    node.proof, node.disproof = 0, PROOF_INFINITY
+                    node.mate_length = 0
+                    proven[node.key] = (0, None)
+                elif node.moves_left == 0:
+                    node.proof, node.disproof = PROOF_INFINITY, 0
+                else:
+                    node.proof = replies
+
+        def expand(node):
+            node.children = []
+            if node.attacker:
+                for move in self.legal_moves(attacker_color):
+                    push(move)
+                    if self.is_check(defender_color):
+                        child = ProofNode(node, move, False, node.moves_left - 1, self.position_key())
+                        lookup(child)
+                        node.children.append(child)
+                    pop()
+            else:
+                for move in self.legal_moves(defender_color):
+                    push(move)
+                    child = ProofNode(node, move, True, node.moves_left, self.position_key())
+                    lookup(child)
+                    node.children.append(child)
+                    pop()
+
+        def update(node):
+            children = node.children
+            if node.attacker:
+                node.proof = min((child.proof for child in children), default=PROOF_INFINITY)
+                node.disproof = min(sum(child.disproof for child in children), PROOF_INFINITY)
+            else:
+                node.proof = min(sum(child.proof for child in children), PROOF_INFINITY)
+                node.disproof = min((child.disproof for child in children), default=PROOF_INFINITY)
+
+            if node.proof == 0:
+                # Атакующий выбирает кратчайший мат, защита — самое упорное сопротивление
+                solved = [child for child in children if child.proof == 0]
+                best = (min if node.attacker else max)(solved, key=lambda child: child.mate_length)
+                node.mate_length = best.mate_length + 1
+                if node.key not in proven or proven[node.key][0] > node.mate_length:
+                    proven[node.key] = (node.mate_length, best.move)
+                node.children = []
+            elif node.disproof == 0:
+                disproven[node.key] = max(disproven.get(node.key, -1), node.moves_left)
+                node.children = []
+
+        try:
+            root = ProofNode(None, None, True, n, self.position_key())
+            lookup(root)
+            while root.proof and root.disproof:
+                # Спускаемся к наиболее доказывающему узлу, выполняя ходы на доске
+                node = root
+                while node.children:
+                    if node.attacker:
+                        node = min(node.children, key=lambda child: child.proof)
+                    else:
+                        node = min(node.children, key=lambda child: child.disproof)
+                    push(node.move)
+
+                expand(node)
+                while node:
+                    update(node)
+                    if node.parent:
+                        pop()
+                    node = node.parent
+
+            if root.proof:
+                return None
+
+            # Восстанавливаем вариант по таблице доказанных позиций
+            line = []
+            while True:
+                mate_length, move = proven[self.position_key()]
+                if move is None:
+                    break
+                line.append(move)
+                push(move)
+            for _ in line:
+                pop()
+            return line
+        finally:
+            self.board.redo_history = redo_history
+            self.cache = cache
+
+    def legal_moves(self, color=None):
+        """
+        Возвращает все легальные ходы стороны.
+
+        Параметры:
+            color (str): Цвет стороны. По умолчанию — сторона, чей сейчас ход.
+
+        Возвращает:
+            list: Список кортежей (start, end) в шахматной нотации.
+        """
+        color = color or self.turn
+        return list(self.cache.get((self.position_key(), 'legal', color), lambda: self.compute_legal_moves(color)))
+
+    def compute_legal_moves(self, color):
+        """
+        Перебирает легальные ходы стороны без обращения к кешу.
+
+        Параметры:
+            color (str): Цвет стороны.
+
+        Возвращает:
+            tuple: Кортежи (start, end) в шахматной нотации.
+        """
+        moves = []
         for i in range(8):
             for j in range(8):
-                if self.board.board[i][j] != '.' and \
-                   self.board.board[i][j].islower() == (color == 'black'):
-                    start = f"{chr(j + ord('a'))}{8 - i}"
-                    for x in range(8):
-                        for y in range(8):
-                            end = f"{chr(y + ord('a'))}{8 - x}"
-                            if self.is_valid_move(start, end):
-                                # Пробуем сделать ход
-                                temp_board = [row[:] for row in self.board.board]
-                                self.board.make_move(start, end)
-                                # Проверяем, все еще ли король под шахом
-                                still_in_check = self.is_check(color)
-                                # Возвращаем доску в исходное состояние
-                                self.board.board = temp_board
-                                # Если есть ход, который выводит из-под шаха, то это не мат
-                                if not still_in_check:
-                                    return False
-
-        return True
+                piece = self.board.board[i][j]
+                if piece != '.' and piece.isupper() == (color == 'white'):
+                    start = self.board.format_position(i, j)
+                    for end in PIECE_CLASSES[piece.lower()](color, start).get_possible_moves(self.board):
+                        if self.is_valid_move(start, end, color):
+                            moves.append((start, end))
+        return tuple(moves)
 
     def hint(self, pos):
         row, col = self.board.parse_position(pos)
         piece = self.board.board[row][col]
-        moves = []
-        
-        if piece.lower() == 'p':
-            moves = Pawn('white' if piece.isupper() else 'black', pos).get_possible_moves(self.board)
-        elif piece.lower() == 'r':
-            moves = Rook('white' if piece.isupper() else 'black', pos).get_possible_moves(self.board)
-        elif piece.lower() == 'n':
-            moves = Knight('white' if piece.isupper() else 'black', pos).get_possible_moves(self.board)
-        elif piece.lower() == 'b':
-            moves = Bishop('white' if piece.isupper() else 'black', pos).get_possible_moves(self.board)
-        elif piece.lower() == 'q':
-            moves = Queen('white' if piece.isupper() else 'black', pos).get_possible_moves(self.board)
-        elif piece.lower() == 'k':
-            moves = King('white' if piece.isupper() else 'black', pos).get_possible_moves(self.board)
+
+        def possible_moves():
+            if piece == '.':
+                return ()
+            return tuple(PIECE_CLASSES[piece.lower()]('white' if piece.isupper() else 'black', pos).get_possible_moves(self.board))
+
+        moves = self.cache.get((self.position_key(), 'hint', pos), possible_moves)
         
         highlight = [(self.board.parse_position(move)[0], self.board.parse_position(move)[1]) for move in moves]
         self.board.print_board(highlight)
@@ -714,114 +1304,10 @@ class Game:
     def threats(self, pos):
         row, col = self.board.parse_position(pos)
         piece = self.board.board[row][col]
-        threats = []
-
-        for i in range(8):
-            for j in range(8):
-                other_piece = self.board.board[i][j]
-                # Проверяем, что это фигура противника
-                if other_piece != '.' and other_piece.islower() != piece.islower():
-                    # Получаем возможные ходы для этой фигуры
-                    if other_piece.lower() == 'p':
-                        # Для пешки учитываем только взятие по диагонали
-                        direction = -1 if other_piece.isupper() else 1  # Направление движения пешки
-                        for delta in [-1, 1]:  # Проверяем обе диагонали
-                            x = i + direction
-                            y = j + delta
-                            if 0 <= x < 8 and 0 <= y < 8:
-                                if (x, y) == (row, col):
-                                    threats.append((i, j))
-                    elif other_piece.lower() == 'r':
-                        # Для ладьи проверяем прямые линии
-                        if i == row or j == col:
-                            # Проверяем, нет ли фигур на пути
-                            if i == row:
-                                step = 1 if j < col else -1
-                                y = j + step
-                                while y != col:
-                                    if self.board.board[i][y] != '.':
-                                        break
-                                    y += step
-                                if y == col:
-                                    threats.append((i, j))
-                            elif j == col:
-                                step = 1 if i < row else -1
-                                x = i + step
-                                while x != row:
-                                    if self.board.board[x][j] != '.':
-                                        break
-                                    x += step
-                                if x == row:
-                                    threats.append((i, j))
-                    elif other_piece.lower() == 'n':
-                        # Для коня проверяем все возможные ходы
-                        knight_moves = [
-                            (i + 2, j + 1), (i + 2, j - 1),
-                            (i - 2, j + 1), (i - 2, j - 1),
-                            (i + 1, j + 2), (i + 1, j - 2),
-                            (i - 1, j + 2), (i - 1, j - 2)
-                        ]
-                        for x, y in knight_moves:
-                            if 0 <= x < 8 and 0 <= y < 8:
-                                if (x, y) == (row, col):
-                                    threats.append((i, j))
-                    elif other_piece.lower() == 'b':
-                        # Для слона проверяем диагонали
-                        if abs(i - row) == abs(j - col):
-                            step_x = 1 if row > i else -1
-                            step_y = 1 if col > j else -1
-                            x, y = i + step_x, j + step_y
-                            while x != row and y != col:
-                                if self.board.board[x][y] != '.':
-                                    break
-                                x += step_x
-                                y += step_y
-                            if x == row and y == col:
-                                threats.append((i, j))
-                    elif other_piece.lower() == 'q':
-                        # Для ферзя проверяем прямые линии и диагонали
-                        if i == row or j == col or abs(i - row) == abs(j - col):
-                            if i == row:
-                                step = 1 if j < col else -1
-                                y = j + step
-                                while y != col:
-                                    if self.board.board[i][y] != '.':
-                                        break
-                                    y += step
-                                if y == col:
-                                    threats.append((i, j))
-                            elif j == col:
-                                step = 1 if i < row else -1
-                                x = i + step
-                                while x != row:
-                                    if self.board.board[x][j] != '.':
-                                        break
-                                    x += step
-                                if x == row:
-                                    threats.append((i, j))
-                            else:
-                                step_x = 1 if row > i else -1
-                                step_y = 1 if col > j else -1
-                                x, y = i + step_x, j + step_y
-                                while x != row and y != col:
-                                    if self.board.board[x][y] != '.':
-                                        break
-                                    x += step_x
-                                    y += step_y
-                                if x == row and y == col:
-                                    threats.append((i, j))
-                    elif other_piece.lower() == 'k':
-                        # Для короля проверяем все соседние клетки
-                        king_moves = [
-                            (i + 1, j), (i - 1, j),
-                            (i, j + 1), (i, j - 1),
-                            (i + 1, j + 1), (i + 1, j - 1),
-                            (i - 1, j + 1), (i - 1, j - 1)
-                        ]
-                        for x, y in king_moves:
-                            if 0 <= x < 8 and 0 <= y < 8:
-                                if (x, y) == (row, col):
-                                    threats.append((i, j))
+        # Оставляем только фигуры противника
+        threats = self.cache.get((self.position_key(), 'threats', pos), lambda: tuple(
+            (i, j) for i, j in sorted(self.square_attackers(self.board.board, row, col))
+            if self.board.board[i][j].islower() != piece.islower()))
 
         # Подсветим угрозы на доске
         self.board.print_board(threats)
@@ -832,41 +1318,369 @@ class Game:
         else:
             print(f"Фигура на позиции {pos} не под угрозой.")
 
-    def save_game(self, filename):
+    def square_attackers(self, board, row, col):
+        """
+        Находит все фигуры обоих цветов, которые непосредственно атакуют клетку.
+        
+        Параметры:
+            board (list): Двумерный список, представляющий доску.
+            row (int): Индекс строки клетки.
+            col (int): Индекс столбца клетки.
+            
+        Возвращает:
+            list: Список позиций (row, col) атакующих фигур.
+        """
+        attackers = []
+
+        # Пешки бьют по диагонали вперед: белые снизу, черные сверху
+        for delta in [-1, 1]:
+            y = col + delta
+            if 0 <= y < 8:
+                if row + 1 < 8 and board[row + 1][y] == 'P':
+                    attackers.append((row + 1, y))
+                if row - 1 >= 0 and board[row - 1][y] == 'p':
+                    attackers.append((row - 1, y))
+
+        for offsets, kinds in ((KNIGHT_OFFSETS, 'Nn'), (KING_OFFSETS, 'Kk')):
+            for dx, dy in offsets:
+                x, y = row + dx, col + dy
+                if 0 <= x < 8 and 0 <= y < 8 and board[x][y] in kinds:
+                    attackers.append((x, y))
+
+        # Дальнобойные фигуры: первая фигура на луче атакует клетку
+        for directions, kinds in ((ROOK_DIRECTIONS, 'rq'), (BISHOP_DIRECTIONS, 'bq')):
+            for dx, dy in directions:
+                x, y = row + dx, col + dy
+                while 0 <= x < 8 and 0 <= y < 8:
+                    if board[x][y] != '.':
+                        if board[x][y].lower() in kinds:
+                            attackers.append((x, y))
+                        break
+                    x += dx
+                    y += dy
+
+        return attackers
+
+    def least_valuable_attacker(self, board, row, col, white):
+        """
+        Находит самую дешевую фигуру указанного цвета, атакующую клетку.
+
+        Параметры:
+            board (list): Двумерный список, представляющий доску.
+            row (int): Индекс строки клетки.
+            col (int): Индекс столбца клетки.
+            white (bool): True для белых фигур, False для черных.
+
+        Возвращает:
+            tuple: Позиция (row, col) фигуры или None, если атакующих нет.
+        """
+        best = None
+        for x, y in self.square_attackers(board, row, col):
+            if board[x][y].isupper() == white:
+                if best is None or SEE_VALUES[board[x][y].lower()] < SEE_VALUES[board[best[0]][best[1]].lower()]:
+                    best = (x, y)
+        return best
+
+    def see(self, square):
+        """
+        Статическая оценка разменов на клетке.
+        Атакующие — фигуры противника фигуры на клетке, защитники — фигуры ее цвета
+        (для пустой клетки атакует сторона, чей сейчас ход). Фигуры, которые вступают
+        в размен из-за спин других дальнобойных фигур (рентген), тоже учитываются.
+
+        Параметры:
+            square (str): Клетка в шахматной нотации.
+
+        Возвращает:
+            dict: Словарь с ключами
+                'attackers' (list) — клетки атакующих фигур,
+                'defenders' (list) — клетки защищающих фигур,
+                'xray' (list) — клетки фигур, атакующих через другие фигуры,
+                'value' (int) — материальный итог размена для атакующей стороны
+                при взятии самой дешевой фигурой (0, если брать нечего).
+        """
+        row, col = self.board.parse_position(square)
+        piece = self.board.board[row][col]
+        white_attacks = piece.islower() if piece != '.' else self.turn == 'white'
+
+        # Снимаем с доски найденных атакующих, открывая фигуры за ними
+        temp_board = [r[:] for r in self.board.board]
+        found = self.square_attackers(temp_board, row, col)
+        xray = []
+        layer = found
+        while layer:
+            for x, y in layer:
+                temp_board[x][y] = '.'
+            layer = [pos for pos in self.square_attackers(temp_board, row, col) if pos not in found]
+            found += layer
+            xray += layer
+
+        def by_value(pos):
+            return SEE_VALUES[self.board.board[pos[0]][pos[1]].lower()]
+
+        attackers = sorted((pos for pos in found if self.board.board[pos[0]][pos[1]].isupper() == white_attacks), key=by_value)
+        defenders = sorted((pos for pos in found if self.board.board[pos[0]][pos[1]].isupper() != white_attacks), key=by_value)
+
+        value = 0
+        if piece != '.':
+            direct = [pos for pos in attackers if pos not in xray]
+            if direct:
+                value = self.see_move(self.board.format_position(*direct[0]), square)
+
+        return {
+            'attackers': [self.board.format_position(*pos) for pos in attackers],
+            'defenders': [self.board.format_position(*pos) for pos in defenders],
+            'xray': [self.board.format_position(*pos) for pos in xray],
+            'value': value,
+        }
+
+    def see_move(self, start, end):
+        """
+        Вычисляет материальный итог взятия на клетке end с последующей серией
+        разменов, в которой каждая сторона бьет самой дешевой фигурой и может
+        остановиться, если продолжение невыгодно.
+
+        Параметры:
+            start (str): Начальная позиция хода.
+            end (str): Конечная позиция хода.
+
+        Возвращает:
+            int: Выигрыш материала ходящей стороной (отрицательный — потеря).
+        """
+        start_row, start_col = self.board.parse_position(start)
+        end_row, end_col = self.board.parse_position(end)
+        temp_board = [row[:] for row in self.board.board]
+        piece = temp_board[start_row][start_col]
+        target = temp_board[end_row][end_col]
+
+        gain = [SEE_VALUES[target.lower()] if target != '.' else 0]
+        temp_board[end_row][end_col] = piece
+        temp_board[start_row][start_col] = '.'
+        occupant_value = SEE_VALUES[piece.lower()]
+        white = piece.islower()  # Отвечает противник
+
+        while True:
+            attacker = self.least_valuable_attacker(temp_board, end_row, end_col, white)
+            if attacker is None:
+                break
+            gain.append(occupant_value - gain[-1])
+            x, y = attacker
+            occupant_value = SEE_VALUES[temp_board[x][y].lower()]
+            temp_board[end_row][end_col] = temp_board[x][y]
+            temp_board[x][y] = '.'
+            white = not white
+
+        # Каждая сторона выбирает между продолжением размена и отказом от него
+        for d in range(len(gain) - 1, 0, -1):
+            gain[d - 1] = -max(-gain[d - 1], gain[d])
+        return gain[0]
+
+    def ordered_captures(self, color=None, prune=True):
+        """
+        Возвращает легальные взятия стороны, упорядоченные по статической оценке разменов.
+        Используется поиском для сортировки взятий и отсечения заведомо проигрышных.
+
+        Параметры:
+            color (str): Цвет стороны. По умолчанию — сторона, чей сейчас ход.
+            prune (bool): Отбрасывать взятия с отрицательной оценкой.
+
+        Возвращает:
+            list: Список кортежей (start, end, see) по убыванию оценки.
+        """
+        color = color or self.turn
+        captures = []
+        for i in range(8):
+            for j in range(8):
+                piece = self.board.board[i][j]
+                if piece != '.' and piece.isupper() == (color == 'white'):
+                    start = self.board.format_position(i, j)
+                    for end in PIECE_CLASSES[piece.lower()](color, start).get_possible_moves(self.board):
+                        end_row, end_col = self.board.parse_position(end)
+                        if self.board.board[end_row][end_col] == '.':
+                            continue
+                        # Дешевая оценка размена раньше дорогой проверки легальности
+                        value = self.see_move(start, end)
+                        if prune and value < 0:
+                            continue
+                        if self.is_valid_move(start, end, color):
+                            captures.append((start, end, value))
+        captures.sort(key=lambda capture: capture[2], reverse=True)
+        return captures
+
+    def save_game(self, filename, interval=CHECKPOINT_INTERVAL):
+        """
+        Сохраняет партию в файл. Каждые interval полуходов после хода записывается
+        контрольная позиция, а в конце файла — индекс смещений контрольных позиций,
+        по которому load_game_at восстанавливает любой полуход без воспроизведения
+        всей партии.
+
+        Параметры:
+            filename (str): Путь к файлу.
+            interval (int): Количество полуходов между контрольными позициями.
+        """
         try:
-            with open(filename, 'w') as file:
-                file.write(f"{self.turn}\n")
-                file.write(f"{self.move_count}\n")
-                for move in self.board.move_history:
-                    start, end, piece, captured_piece = move
-
-                    start_row, start_col = self.board.parse_position(start)
-                    end_row, end_col = self.board.parse_position(end)
-                    
-                    start_pos = f"{chr(start_col + ord('a'))}{8 - start_row}"
-                    end_pos = f"{chr(end_col + ord('a'))}{8 - end_row}"
-                    full_notation = f"{piece}{start_pos}{end_pos}"
-                    file.write(f"{full_notation}\n")
+            if self.board.custom_start:
+                raise ValueError("партия начата не из начальной расстановки")
+            if self.board.base_ply:
+                raise ValueError("партия загружена с контрольной позиции, начало партии недоступно")
+            lines = [f"{self.turn}\n", f"{self.move_count}\n"]
+            offset = sum(len(line) for line in lines)
+            offsets = [offset]
+            replay = Board()
+            for ply, move in enumerate(self.board.move_history, 1):
+                start, end, piece, captured_piece = move
+                start_row, start_col = self.board.parse_position(start)
+                end_row, end_col = self.board.parse_position(end)
+
+                start_pos = f"{chr(start_col + ord('a'))}{8 - start_row}"
+                end_pos = f"{chr(end_col + ord('a'))}{8 - end_row}"
+                full_notation = f"{piece}{start_pos}{end_pos}"
+                lines.append(f"{full_notation}\n")
+                offset += len(lines[-1])
+
+                replay.make_move(start, end)
+                if ply % interval == 0:
+                    # Контрольная позиция: номер полухода и 64 клетки доски подряд
+                    offsets.append(offset)
+                    lines.append(f"= {ply} {''.join(''.join(row) for row in replay.board)}\n")
+                    offset += len(lines[-1])
+
+            lines.append(f"index {interval} {len(self.board.move_history)} {' '.join(map(str, offsets))}\n")
+            # Смещения считаются в байтах, поэтому файл пишется без преобразования переводов строк
+            with open(filename, 'w', newline='\n') as file:
+                file.writelines(lines)
             print(f"Партия сохранена в файл {filename}")
         except Exception as e:
             print(f"Ошибка при сохранении партии: {e}")
 
     def load_game(self, filename):
         try:
-            with open(filename, 'r') as file:
-                self.turn = file.readline().strip()
-                self.move_count = int(file.readline().strip())
-                self.board = Board()
-                for line in file:
-                    move = line.strip()
-                    piece = move[0]
-                    start_pos = move[1:3]
-                    end_pos = move[3:5]
-                    self.board.make_move(start_pos, end_pos)
+            self.turn, self.move_count, moves = read_save_file(filename)
+            self.board = Board()
+            for piece, start_pos, end_pos in moves:
+                self.board.make_move(start_pos, end_pos)
             print(f"Партия загружена из файла {filename}")
         except Exception as e:
             print(f"Ошибка при загрузке партии: {e}")
 
+    def load_game_at(self, filename, ply):
+        """
+        Загружает позицию партии после указанного полухода. Восстанавливается
+        ближайшая предшествующая контрольная позиция, после чего воспроизводится
+        не более CHECKPOINT_INTERVAL ходов. История ходов начинается с контрольной
+        позиции, поэтому отменить ход раньше нее нельзя. Файлы без индекса
+        воспроизводятся с начала партии.
+
+        Параметры:
+            filename (str): Путь к файлу партии.
+            ply (int): Номер полухода (0 — начальная позиция).
+        """
+        try:
+            with open(filename, 'rb') as file:
+                file.readline()
+                file.readline()
+                moves_offset = file.tell()
+                index = read_save_index(file)
+                board = Board()
+                if index:
+                    interval, total, offsets = index
+                    if not 0 <= ply <= total:
+                        raise ValueError(f"в партии {total} полуходов, полуход {ply} недоступен")
+                    checkpoint = min(ply // interval, len(offsets) - 1)
+                    file.seek(offsets[checkpoint])
+                    if checkpoint:
+                        _, base_ply, cells = file.readline().decode().split()
+                        board.set_position([list(cells[i:i + 8]) for i in range(0, 64, 8)], int(base_ply))
+                elif ply < 0:
+                    raise ValueError(f"полуход {ply} недоступен")
+                else:
+                    file.seek(moves_offset)
+
+                while board.base_ply + len(board.move_history) < ply:
+                    move = file.readline().decode().strip()
+                    if not move or move.startswith('index'):
+                        raise ValueError(f"в партии нет полухода {ply}")
+                    if move.startswith('='):
+                        continue
+                    board.make_move(move[1:3], move[3:5])
+
+            self.board = board
+            self.turn = 'white' if ply % 2 == 0 else 'black'
+            self.move_count = ply
+            print(f"Партия загружена из файла {filename} на полуходе {ply}")
+        except Exception as e:
+            print(f"Ошибка при загрузке партии: {e}")
+
+def iter_save_files(archive):
+    """
+    Перечисляет файлы партий архива в детерминированном порядке, не загружая их в память.
+
+    Параметры:
+        archive (str): Каталог с файлами партий (обходится рекурсивно) или путь к одному файлу.
+
+    Возвращает:
+        generator: Пути к файлам партий.
+    """
+    if os.path.isfile(archive):
+        yield archive
+        return
+    for root, dirs, files in os.walk(archive):
+        dirs.sort()
+        for name in sorted(files):
+            yield os.path.join(root, name)
+
+def read_save_index(file):
+    """
+    Читает индекс контрольных позиций из последней строки файла партии.
+
+    Параметры:
+        file: Файл партии, открытый в двоичном режиме.
+
+    Возвращает:
+        tuple: Интервал контрольных позиций, количество полуходов и список
+        байтовых смещений (первое — начало ходов, остальные — контрольные позиции),
+        или None, если файл записан в формате без индекса.
+    """
+    file.seek(0, 2)
+    end = file.tell()
+    block = 256
+    tail = b''
+    # Читаем файл с конца, пока не найдем начало последней строки
+    while True:
+        start = max(end - block, 0)
+        file.seek(start)
+        tail = file.read(end - start)
+        if tail.rstrip(b'\n').rfind(b'\n') >= 0 or start == 0:
+            break
+        block *= 2
+    last_line = tail.rstrip(b'\n').rsplit(b'\n', 1)[-1].decode()
+    if not last_line.startswith('index'):
+        return None
+    values = [int(value) for value in last_line.split()[1:]]
+    return values[0], values[1], values[2:]
+
+def read_save_file(filename):
+    """
+    Читает файл партии, записанный Game.save_game, не воспроизводя ходы.
+
+    Параметры:
+        filename (str): Путь к файлу партии.
+
+    Возвращает:
+        tuple: Очередь хода (str), количество ходов (int) и список ходов
+        в виде кортежей (piece, start, end).
+    """
+    with open(filename, 'r') as file:
+        turn = file.readline().strip()
+        move_count = int(file.readline().strip())
+        moves = []
+        for line in file:
+            move = line.strip()
+            # Контрольные позиции и индекс не нужны для воспроизведения
+            if move and not move.startswith('=') and not move.startswith('index'):
+                moves.append((move[0], move[1:3], move[3:5]))
+    return turn, move_count, moves
+
 if __name__ == "__main__":
     game = Game()
     game.play()
\ No newline at end of file
@@ -0,0 +1,257 @@
+"""
+Экспорт позиций из архива сохраненных партий в массивы NumPy для обучения моделей оценки.
+
+Каждая партия воспроизводится один раз, каждая позиция кодируется как 12 битовых
+плоскостей 8x8 (по одной на тип и цвет фигуры). Позиции записываются фрагментами
+фиксированного размера в файлы positions_NNNNN.npy (uint8, форма (N, 12, 8, 8))
+и meta_NNNNN.npy (структурированный массив META_DTYPE), которые можно открывать
+через np.load(..., mmap_mode='r'). Список партий пишется в games.tsv.
+
+Пример запуска:
+    python dataset_export.py archive/ dataset/ --chunk-size 65536 --dedup --workers 4
+"""
+import argparse
+import os
+import sqlite3
+from multiprocessing import Pool
+
+import numpy as np
+
+from chess_class import Game, iter_save_files, read_save_file
+from position_index import to_sqlite_key
+
+# Наибольшее количество параметров в одном запросе SQLite
+SQLITE_BATCH = 500
+
+# Порядок битовых плоскостей: сначала белые фигуры, затем черные
+PLANE_ORDER = 'PNBRQKpnbrqk'
+PLANE_INDEX = {symbol: index for index, symbol in enumerate(PLANE_ORDER)}
+
+META_DTYPE = np.dtype([
+    ('hash', '<u8'),         # Хеш позиции с учетом очереди хода
+    ('game', '<i4'),         # Номер партии в games.tsv
+    ('ply', '<i2'),          # Номер полухода (0 — начальная позиция)
+    ('side_to_move', 'i1'),  # 0 — ход белых, 1 — ход черных
+    ('result', 'i1'),        # 1 — победа белых, -1 — победа черных, 0 — ничья или партия не окончена
+])
+
+
+def encode_board(board, planes):
+    """
+    Записывает расстановку фигур в битовые плоскости.
+
+    Параметры:
+        board (Board): Объект доски.
+        planes (numpy.ndarray): Обнуленный массив формы (12, 8, 8) для заполнения.
+    """
+    for i in range(8):
+        for j in range(8):
+            piece = board.board[i][j]
+            if piece != '.':
+                planes[PLANE_INDEX[piece], i, j] = 1
+
+
+def replay_game(task):
+    """
+    Воспроизводит одну партию и кодирует все ее позиции.
+    Выполняется в рабочих процессах, поэтому возвращает только массивы NumPy.
+
+    Параметры:
+        task (tuple): Номер партии и путь к файлу.
+
+    Возвращает:
+        tuple: Номер партии, путь, массив плоскостей (N, 12, 8, 8) и массив метаданных (N,),
+        или номер партии, путь и None, None, если файл не удалось прочитать.
+    """
+    game_id, filename = task
+    try:
+        turn, move_count, moves = read_save_file(filename)
+        game = Game()
+        planes = np.zeros((len(moves) + 1, 12, 8, 8), dtype=np.uint8)
+        meta = np.zeros(len(moves) + 1, dtype=META_DTYPE)
+        for ply in range(len(moves) + 1):
+            if ply:
+                piece, start, end = moves[ply - 1]
+                game.board.make_move(start, end)
+                game.turn = 'black' if game.turn == 'white' else 'white'
+            encode_board(game.board, planes[ply])
+            meta[ply] = (game.position_key(), game_id, ply, game.turn == 'black', 0)
+
+        # Результат известен только для партий, закончившихся матом
+        game.turn = turn
+        if game.is_checkmate(turn):
+            meta['result'] = -1 if turn == 'white' else 1
+        return game_id, filename, planes, meta
+    except Exception as e:
+        print(f"Ошибка при чтении партии {filename}: {e}")
+        return game_id, filename, None, None
+
+
+class SeenPositions:
+    def __init__(self, path):
+        """
+        Множество хешей уже записанных позиций, хранящееся в таблице SQLite на диске.
+        Память ограничена кешем страниц SQLite и не растет с размером архива.
+
+        Параметры:
+            path (str): Путь к временному файлу базы; существующий файл перезаписывается.
+        """
+        if os.path.exists(path):
+            os.remove(path)
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode = OFF")
+        self.connection.execute("PRAGMA synchronous = OFF")
+        self.connection.execute("CREATE TABLE seen (hash INTEGER PRIMARY KEY)")
+
+    def filter_new(self, hashes):
+        """
+        Отмечает позиции, которые встречаются впервые, и запоминает их хеши.
+
+        Параметры:
+            hashes (numpy.ndarray): Хеши позиций партии (uint64).
+
+        Возвращает:
+            numpy.ndarray: Булев массив, True для новых позиций.
+        """
+        keys = [to_sqlite_key(key) for key in hashes.tolist()]
+        existing = set()
+        for start in range(0, len(keys), SQLITE_BATCH):
+            batch = keys[start:start + SQLITE_BATCH]
+            query = f"SELECT hash FROM seen WHERE hash IN ({','.join('?' * len(batch))})"
+            existing.update(row[0] for row in self.connection.execute(query, batch))
+
+        # Повторы внутри самой партии тоже считаются дубликатами
+        keep = np.zeros(len(keys), dtype=bool)
+        for i, key in enumerate(keys):
+            if key not in existing:
+                keep[i] = True
+                existing.add(key)
+        self.connection.executemany("INSERT INTO seen (hash) VALUES (?)", ((key,) for key, new in zip(keys, keep) if new))
+        return keep
+
+    def close(self):
+        """Закрывает базу и удаляет ее файл."""
+        self.connection.commit()
+        self.connection.close()
+        os.remove(self.path)
+
+
+class ChunkWriter:
+    def __init__(self, out_dir, chunk_size):
+        """
+        Накапливает позиции в буфере фиксированного размера и сбрасывает его
+        в очередную пару файлов .npy при заполнении.
+
+        Параметры:
+            out_dir (str): Каталог для файлов фрагментов.
+            chunk_size (int): Количество позиций в одном фрагменте.
+        """
+        self.out_dir = out_dir
+        self.chunk_size = chunk_size
+        self.planes = np.zeros((chunk_size, 12, 8, 8), dtype=np.uint8)
+        self.meta = np.zeros(chunk_size, dtype=META_DTYPE)
+        self.size = 0
+        self.chunk_count = 0
+        self.position_count = 0
+
+    def append(self, planes, meta):
+        """
+        Добавляет позиции в буфер, записывая заполненные фрагменты на диск.
+
+        Параметры:
+            planes (numpy.ndarray): Массив плоскостей (N, 12, 8, 8).
+            meta (numpy.ndarray): Массив метаданных (N,).
+        """
+        offset = 0
+        while offset < len(meta):
+            count = min(self.chunk_size - self.size, len(meta) - offset)
+            self.planes[self.size:self.size + count] = planes[offset:offset + count]
+            self.meta[self.size:self.size + count] = meta[offset:offset + count]
+            self.size += count
+            offset += count
+            if self.size == self.chunk_size:
+                self.flush()
+
+    def flush(self):
+        """
+        Записывает заполненную часть буфера в очередной фрагмент.
+        """
+        if not self.size:
+            return
+        name = f"{self.chunk_count:05d}.npy"
+        np.save(os.path.join(self.out_dir, f"positions_{name}"), self.planes[:self.size])
+        np.save(os.path.join(self.out_dir, f"meta_{name}"), self.meta[:self.size])
+        self.chunk_count += 1
+        self.position_count += self.size
+        self.size = 0
+
+
+def export_dataset(archive, out_dir, chunk_size=65536, dedup=False, workers=1):
+    """
+    Потоково воспроизводит партии архива и записывает позиции во фрагменты .npy.
+    В памяти одновременно находятся только буфер текущего фрагмента и партии,
+    которые обрабатываются рабочими процессами, поэтому размер архива не ограничен
+    объемом памяти. Хеши уникальных позиций для дедупликации хранятся на диске
+    во временной таблице SQLite в out_dir.
+
+    Параметры:
+        archive (str): Каталог с файлами партий или путь к одному файлу.
+        out_dir (str): Каталог для результатов.
+        chunk_size (int): Количество позиций в одном фрагменте.
+        dedup (bool): Пропускать позиции, уже встречавшиеся в архиве.
+        workers (int): Количество рабочих процессов.
+
+    Возвращает:
+        dict: Статистика экспорта: партии, пропущенные файлы, позиции, дубликаты, фрагменты.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    writer = ChunkWriter(out_dir, chunk_size)
+    seen = SeenPositions(os.path.join(out_dir, 'dedup.sqlite')) if dedup else None
+    stats = {'games': 0, 'skipped': 0, 'positions': 0, 'duplicates': 0, 'chunks': 0}
+
+    tasks = enumerate(iter_save_files(archive))
+    pool = Pool(workers) if workers > 1 else None
+    results = pool.imap(replay_game, tasks, chunksize=16) if pool else map(replay_game, tasks)
+    try:
+        with open(os.path.join(out_dir, 'games.tsv'), 'w') as index:
+            for game_id, filename, planes, meta in results:
+                index.write(f"{game_id}\t{filename}\n")
+                if meta is None:
+                    stats['skipped'] += 1
+                    continue
+                stats['games'] += 1
+                if seen:
+                    keep = seen.filter_new(meta['hash'])
+                    stats['duplicates'] += int(len(meta) - keep.sum())
+                    planes, meta = planes[keep], meta[keep]
+                writer.append(planes, meta)
+        writer.flush()
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+        if seen:
+            seen.close()
+
+    stats['positions'] = writer.position_count
+    stats['chunks'] = writer.chunk_count
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Экспорт позиций из архива партий в массивы NumPy.")
+    parser.add_argument('archive', help="Каталог с файлами партий или путь к файлу партии")
+    parser.add_argument('out_dir', help="Каталог для файлов .npy")
+    parser.add_argument('--chunk-size', type=int, default=65536, help="Количество позиций в одном файле")
+    parser.add_argument('--dedup', action='store_true', help="Пропускать повторяющиеся позиции")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Количество рабочих процессов")
+    args = parser.parse_args()
+
+    stats = export_dataset(args.archive, args.out_dir, args.chunk_size, args.dedup, args.workers)
+    print(f"Партий: {stats['games']}, пропущено файлов: {stats['skipped']}, "
+          f"позиций: {stats['positions']}, дубликатов: {stats['duplicates']}, фрагментов: {stats['chunks']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,407 @@
+"""
+Поиск хода с контролем времени и обдумыванием на времени соперника.
+
+Search выполняет итеративное углубление с альфа-бета отсечением и форсированным
+вариантом взятий, упорядоченных статической оценкой разменов. TimeManager
+рассчитывает бюджет на ход по оставшемуся времени и добавке, Deadline хранит
+мягкий и жесткий пределы, которые поиск проверяет каждые несколько сотен узлов.
+Engine связывает все вместе и умеет обдумывать ожидаемый ответ соперника в фоновом потоке.
+
+Пример использования:
+    engine = Engine()
+    result = engine.think(game, remaining=300, increment=2)
+    game.board.make_move(*result.move)
+    game.turn = 'black' if game.turn == 'white' else 'white'
+    engine.ponder(game)
+    ...  # соперник ходит
+    result = engine.on_opponent_move(game, remaining=295, increment=2)
+"""
+import threading
+import time
+from collections import namedtuple
+
+from chess_class import PositionCache
+
+MATE_SCORE = 100000
+CHECK_INTERVAL = 256  # Как часто (в узлах) поиск сверяется с часами
+SEARCH_CACHE_SIZE = 65536  # Размер собственного кеша позиций одного поиска
+# Во сколько раз следующая итерация углубления дольше предыдущей: по умолчанию
+# и пределы для отношения, измеренного на последних итерациях. Отношение чередуется
+# на четной и нечетной глубине, поэтому берется наибольшее из двух последних
+ITERATION_GROWTH = 4.0
+MIN_ITERATION_GROWTH = 2.0
+MAX_ITERATION_GROWTH = 16.0
+
+SearchResult = namedtuple('SearchResult', ['move', 'score', 'depth', 'pv', 'nodes'])
+
+
+class SearchTimeout(Exception):
+    """Поиск прерван по жесткому пределу времени или по команде остановки."""
+
+
+class Deadline:
+    def __init__(self, soft=None, hard=None):
+        """
+        Пределы времени поиска в секундах от текущего момента.
+        Мягкий предел проверяется между итерациями углубления, жесткий — внутри поиска.
+        None означает отсутствие предела (обдумывание на времени соперника).
+
+        Параметры:
+            soft (float): Время, после которого не начинается новая итерация.
+            hard (float): Время, после которого поиск прерывается.
+        """
+        self.start = time.monotonic()
+        self.stopped = False
+        self.set(soft, hard)
+
+    def set(self, soft=None, hard=None):
+        """
+        Устанавливает новые пределы, отсчитывая их от текущего момента.
+        Может вызываться из другого потока во время поиска.
+        """
+        now = time.monotonic()
+        self.soft = now + soft if soft is not None else None
+        self.hard = now + hard if hard is not None else None
+
+    def stop(self):
+        """Немедленно прерывает поиск."""
+        self.stopped = True
+
+    def elapsed(self):
+        """Возвращает время в секундах с момента создания."""
+        return time.monotonic() - self.start
+
+    def fits(self, duration):
+        """
+        Проверяет, успеет ли работа указанной длительности завершиться до мягкого предела.
+
+        Параметры:
+            duration (float): Ожидаемая длительность в секундах.
+        """
+        return not self.stopped and (self.soft is None or time.monotonic() + duration <= self.soft)
+
+    def soft_expired(self):
+        return self.stopped or (self.soft is not None and time.monotonic() >= self.soft)
+
+    def hard_expired(self):
+        return self.stopped or (self.hard is not None and time.monotonic() >= self.hard)
+
+
+class TimeManager:
+    def __init__(self, moves_to_go=40, min_moves_to_go=10, hard_factor=3.0, max_fraction=0.5, overhead=0.05):
+        """
+        Рассчитывает бюджет времени на ход.
+
+        Параметры:
+            moves_to_go (int): Ожидаемая длина партии в ходах одной стороны.
+            min_moves_to_go (int): Нижняя граница оценки оставшихся ходов.
+            hard_factor (float): Во сколько раз жесткий предел больше мягкого.
+            max_fraction (float): Наибольшая доля оставшегося времени на один ход.
+            overhead (float): Запас на задержки в секундах.
+        """
+        self.moves_to_go = moves_to_go
+        self.min_moves_to_go = min_moves_to_go
+        self.hard_factor = hard_factor
+        self.max_fraction = max_fraction
+        self.overhead = overhead
+
+    def budget(self, remaining, increment=0.0, move_count=0):
+        """
+        Вычисляет мягкий и жесткий пределы времени на ход.
+
+        Параметры:
+            remaining (float): Оставшееся время на часах в секундах.
+            increment (float): Добавка за ход в секундах.
+            move_count (int): Количество сделанных полуходов (Game.move_count).
+
+        Возвращает:
+            tuple: Мягкий и жесткий пределы в секундах.
+        """
+        moves_to_go = max(self.min_moves_to_go, self.moves_to_go - move_count // 2)
+        available = max(remaining - self.overhead, 0.01)
+        soft = available / moves_to_go + increment * 0.8
+        hard = min(soft * self.hard_factor, available * self.max_fraction)
+        return min(soft, hard), hard
+
+
+class Search:
+    def __init__(self, game, deadline, max_depth=64):
+        """
+        Поиск лучшего хода для стороны, чей ход в игре. Работает на копии игры
+        с собственным кешем позиций, поэтому может выполняться в отдельном потоке
+        и не вытесняет записи кеша, которым пользуется интерфейс.
+
+        Параметры:
+            game (Game): Игра, в которой ищется ход.
+            deadline (Deadline): Пределы времени поиска.
+            max_depth (int): Наибольшая глубина итеративного углубления.
+        """
+        self.game = game.copy(PositionCache(SEARCH_CACHE_SIZE))
+        self.deadline = deadline
+        self.max_depth = max_depth
+        self.nodes = 0
+        self.result = None
+        self.iteration_start = None
+        self.iteration_estimate = None
+
+    def run(self):
+        """
+        Выполняет итеративное углубление до исчерпания времени или глубины.
+        Следующая итерация начинается, только если по времени предыдущей
+        ожидается, что она завершится до мягкого предела.
+
+        Возвращает:
+            SearchResult: Результат последней завершенной итерации
+            (move равен None, если легальных ходов нет).
+        """
+        pv = []
+        moves = self.game.legal_moves()
+        self.result = SearchResult(moves[0] if moves else None, 0, 0, moves[:1], 0)
+        if len(moves) <= 1 and self.deadline.soft is not None:
+            return self.result
+
+        previous_time = None
+        ratios = []
+        self.iteration_start = time.monotonic()
+        for depth in range(1, self.max_depth + 1):
+            try:
+                score, pv = self.negamax(depth, -MATE_SCORE - 1, MATE_SCORE + 1, 0, pv)
+            except SearchTimeout:
+                break
+            self.result = SearchResult(pv[0] if pv else None, score, depth, pv, self.nodes)
+
+            now = time.monotonic()
+            iteration_time = now - self.iteration_start
+            if previous_time:
+                ratios = ratios[-1:] + [iteration_time / previous_time]
+            growth = min(max(max(ratios, default=ITERATION_GROWTH), MIN_ITERATION_GROWTH), MAX_ITERATION_GROWTH)
+            previous_time = iteration_time
+            self.iteration_start = now
+            self.iteration_estimate = iteration_time * growth
+            if abs(score) >= MATE_SCORE - self.max_depth or not self.deadline.fits(self.iteration_estimate):
+                break
+        return self.result
+
+    def time_to_finish(self):
+        """
+        Оценивает, сколько секунд осталось до завершения текущей итерации.
+        Может вызываться из другого потока во время поиска.
+
+        Возвращает:
+            float: Ожидаемое время в секундах или None, если ни одна итерация
+            еще не завершена и оценить его не по чему.
+        """
+        if self.iteration_estimate is None:
+            return None
+        return self.iteration_start + self.iteration_estimate - time.monotonic()
+
+    def check_time(self):
+        self.nodes += 1
+        if self.nodes % CHECK_INTERVAL == 0 and self.deadline.hard_expired():
+            raise SearchTimeout()
+
+    def make_move(self, start, end):
+        self.game.board.make_move(start, end)
+        self.game.turn = 'black' if self.game.turn == 'white' else 'white'
+
+    def undo_move(self):
+        self.game.board.undo_move()
+        self.game.turn = 'black' if self.game.turn == 'white' else 'white'
+
+    def evaluate(self):
+        """Оценка позиции с точки зрения стороны, чей ход."""
+        score = self.game.board.evaluate()
+        return score if self.game.turn == 'white' else -score
+
+    def order_moves(self, moves, pv_move):
+        """
+        Ставит первым ход из главного варианта предыдущей итерации,
+        затем взятия по убыванию статической оценки разменов, затем тихие ходы.
+        """
+        board = self.game.board
+
+        def key(move):
+            if move == pv_move:
+                return MATE_SCORE
+            row, col = board.parse_position(move[1])
+            if board.board[row][col] == '.':
+                return -MATE_SCORE
+            return self.game.see_move(*move)
+
+        return sorted(moves, key=key, reverse=True)
+
+    def negamax(self, depth, alpha, beta, ply, pv):
+        """
+        Альфа-бета поиск в форме негамакс.
+
+        Параметры:
+            depth (int): Оставшаяся глубина.
+            alpha, beta (int): Окно поиска.
+            ply (int): Расстояние от корня.
+            pv (list): Главный вариант предыдущей итерации от этого узла.
+
+        Возвращает:
+            tuple: Оценка и главный вариант (список ходов).
+        """
+        self.check_time()
+        if depth == 0:
+            return self.quiescence(alpha, beta), []
+
+        moves = self.game.legal_moves()
+        if not moves:
+            # Мат или пат
+            return (-MATE_SCORE + ply if self.game.is_check(self.game.turn) else 0), []
+
+        best_pv = []
+        for move in self.order_moves(moves, pv[0] if pv else None):
+            self.make_move(*move)
+            try:
+                score, child_pv = self.negamax(depth - 1, -beta, -alpha, ply + 1, pv[1:] if pv and move == pv[0] else [])
+            finally:
+                self.undo_move()
+            score = -score
+            if score > alpha:
+                alpha = score
+                best_pv = [move] + child_pv
+                if alpha >= beta:
+                    break
+        return alpha, best_pv
+
+    def quiescence(self, alpha, beta):
+        """
+        Форсированный вариант: продолжает только невыгодные для противника взятия,
+        отсекая проигрывающие размены по статической оценке.
+        """
+        self.check_time()
+        stand_pat = self.evaluate()
+        if stand_pat >= beta:
+            return stand_pat
+        alpha = max(alpha, stand_pat)
+
+        for start, end, see in self.game.ordered_captures():
+            self.make_move(start, end)
+            try:
+                score = -self.quiescence(-beta, -alpha)
+            finally:
+                self.undo_move()
+            if score > alpha:
+                alpha = score
+                if alpha >= beta:
+                    break
+        return alpha
+
+
+class Engine:
+    def __init__(self, time_manager=None, max_depth=64):
+        """
+        Движок, выбирающий ходы с контролем времени и обдумыванием на времени соперника.
+
+        Параметры:
+            time_manager (TimeManager): Расчет бюджета времени. По умолчанию — с настройками по умолчанию.
+            max_depth (int): Наибольшая глубина поиска.
+        """
+        self.time_manager = time_manager or TimeManager()
+        self.max_depth = max_depth
+        self.last_result = None
+        self.ponder_move = None
+        self.ponder_search = None
+        self.ponder_thread = None
+
+    def think(self, game, remaining, increment=0.0):
+        """
+        Ищет ход для стороны, чей ход в игре, укладываясь в бюджет времени.
+
+        Параметры:
+            game (Game): Текущая игра.
+            remaining (float): Оставшееся время на часах в секундах.
+            increment (float): Добавка за ход в секундах.
+
+        Возвращает:
+            SearchResult: Результат поиска.
+        """
+        self.stop_pondering()
+        soft, hard = self.time_manager.budget(remaining, increment, game.move_count)
+        self.last_result = Search(game, Deadline(soft, hard), self.max_depth).run()
+        return self.last_result
+
+    def ponder(self, game, expected_move=None):
+        """
+        Начинает в фоновом потоке поиск ответа на ожидаемый ход соперника.
+        Вызывается после того, как ход движка сделан в игре.
+
+        Параметры:
+            game (Game): Игра, в которой ходит соперник.
+            expected_move (tuple): Ожидаемый ход (start, end). По умолчанию —
+                второй ход главного варианта последнего поиска.
+        """
+        self.stop_pondering()
+        if expected_move is None:
+            if not self.last_result or len(self.last_result.pv) < 2:
+                return
+            expected_move = self.last_result.pv[1]
+        if not game.is_valid_move(*expected_move):
+            return
+
+        ponder_game = game.copy()
+        ponder_game.board.make_move(*expected_move)
+        ponder_game.turn = 'black' if ponder_game.turn == 'white' else 'white'
+        ponder_game.move_count += 1
+
+        self.ponder_move = expected_move
+        self.ponder_search = Search(ponder_game, Deadline(), self.max_depth)
+        self.ponder_thread = threading.Thread(target=self.ponder_search.run, daemon=True)
+        self.ponder_thread.start()
+
+    def ponder_hit(self, remaining, increment=0.0):
+        """
+        Соперник сделал ожидаемый ход: фоновый поиск продолжается в рамках бюджета,
+        причем время обдумывания вычитается из обоих пределов. Если бюджет уже
+        исчерпан или текущая итерация не успевает завершиться до мягкого предела,
+        сразу возвращается результат последней завершенной итерации.
+
+        Параметры:
+            remaining (float): Оставшееся время на часах в секундах.
+            increment (float): Добавка за ход в секундах.
+
+        Возвращает:
+            SearchResult: Результат поиска.
+        """
+        search = self.ponder_search
+        soft, hard = self.time_manager.budget(remaining, increment, search.game.move_count)
+        pondered = search.deadline.elapsed()
+        soft -= pondered
+        hard -= pondered
+        finish = search.time_to_finish()
+        if soft <= 0 or (finish is not None and finish > soft):
+            search.deadline.stop()
+        else:
+            search.deadline.set(soft, hard)
+        self.ponder_thread.join()
+        self.last_result = search.result
+        self.ponder_move = self.ponder_search = self.ponder_thread = None
+        return self.last_result
+
+    def stop_pondering(self):
+        """Прерывает фоновый поиск, если он идет, и отбрасывает его результат."""
+        if self.ponder_thread:
+            self.ponder_search.deadline.stop()
+            self.ponder_thread.join()
+        self.ponder_move = self.ponder_search = self.ponder_thread = None
+
+    def on_opponent_move(self, game, remaining, increment=0.0):
+        """
+        Выбирает ответ после хода соперника, используя результат обдумывания,
+        если соперник сделал ожидаемый ход.
+
+        Параметры:
+            game (Game): Игра после хода соперника.
+            remaining (float): Оставшееся время на часах в секундах.
+            increment (float): Добавка за ход в секундах.
+
+        Возвращает:
+            SearchResult: Результат поиска.
+        """
+        last_move = game.board.move_history[-1][:2] if game.board.move_history else None
+        if self.ponder_thread and last_move == self.ponder_move:
+            return self.ponder_hit(remaining, increment)
+        return self.think(game, remaining, increment)
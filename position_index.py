@@ -0,0 +1,195 @@
+"""
+Индекс позиций архива партий: "в каких партиях встречалась эта позиция".
+
+Каждая партия воспроизводится один раз, хеш каждой ее позиции (с учетом очереди хода)
+записывается во встроенную базу SQLite вместе с номером партии и полухода.
+Таблица позиций упорядочена по хешу, поэтому запрос — это поиск по ключу.
+При обновлении индекса уже проиндексированные и не изменившиеся файлы пропускаются,
+а партии удаленных и переставших читаться файлов убираются из индекса.
+
+Пример запуска:
+    python position_index.py index.db update archive/
+    python position_index.py index.db query "rnbqkbnr/pppp1ppp/8/4p3/4P3/8/PPPP1PPP/RNBQKBNR w - - 0 2"
+"""
+import argparse
+import os
+import sqlite3
+
+from chess_class import Board, Game, ZOBRIST_BLACK_TO_MOVE, iter_save_files, read_save_file
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS positions (
+    hash INTEGER NOT NULL,
+    game_id INTEGER NOT NULL,
+    ply INTEGER NOT NULL,
+    PRIMARY KEY (hash, game_id, ply)
+) WITHOUT ROWID;
+"""
+
+
+def to_sqlite_key(key):
+    """
+    Преобразует беззнаковый 64-битный хеш в знаковое целое, которое хранит SQLite.
+    """
+    return key - (1 << 64) if key >= 1 << 63 else key
+
+
+class PositionIndex:
+    def __init__(self, path):
+        """
+        Открывает (или создает) индекс позиций.
+
+        Параметры:
+            path (str): Путь к файлу базы SQLite.
+        """
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def update(self, archive):
+        """
+        Добавляет в индекс новые и изменившиеся партии архива и удаляет из него
+        партии, файлы которых больше не существуют или перестали читаться.
+
+        Параметры:
+            archive (str): Каталог с файлами партий или путь к одному файлу.
+
+        Возвращает:
+            dict: Количество проиндексированных, пропущенных (без изменений), ошибочных
+            и удаленных из индекса файлов.
+        """
+        stats = {'indexed': 0, 'unchanged': 0, 'failed': 0, 'removed': 0}
+        seen = set()
+        for filename in iter_save_files(archive):
+            path = os.path.abspath(filename)
+            seen.add(path)
+            stat = os.stat(path)
+            row = self.connection.execute("SELECT id, size, mtime FROM games WHERE path = ?", (path,)).fetchone()
+            if row and row[1] == stat.st_size and row[2] == stat.st_mtime:
+                stats['unchanged'] += 1
+                continue
+
+            try:
+                keys = self.replay(path)
+            except Exception as e:
+                print(f"Ошибка при чтении партии {path}: {e}")
+                stats['failed'] += 1
+                # Старые позиции измененного файла больше не соответствуют его содержимому
+                if row:
+                    self.remove(row[0])
+                    stats['removed'] += 1
+                continue
+
+            with self.connection:
+                if row:
+                    game_id = row[0]
+                    self.connection.execute("DELETE FROM positions WHERE game_id = ?", (game_id,))
+                    self.connection.execute("UPDATE games SET size = ?, mtime = ? WHERE id = ?",
+                                            (stat.st_size, stat.st_mtime, game_id))
+                else:
+                    game_id = self.connection.execute("INSERT INTO games (path, size, mtime) VALUES (?, ?, ?)",
+                                                      (path, stat.st_size, stat.st_mtime)).lastrowid
+                self.connection.executemany("INSERT OR IGNORE INTO positions (hash, game_id, ply) VALUES (?, ?, ?)",
+                                            ((key, game_id, ply) for ply, key in enumerate(keys)))
+            stats['indexed'] += 1
+
+        # Удаляем партии из обойденной части архива, файлов которых больше нет
+        root = os.path.abspath(archive)
+        for game_id, path in self.connection.execute("SELECT id, path FROM games").fetchall():
+            if path not in seen and (path == root or path.startswith(os.path.join(root, ''))):
+                self.remove(game_id)
+                stats['removed'] += 1
+        return stats
+
+    def remove(self, game_id):
+        """
+        Удаляет партию и все ее позиции из индекса.
+
+        Параметры:
+            game_id (int): Номер партии в таблице games.
+        """
+        with self.connection:
+            self.connection.execute("DELETE FROM positions WHERE game_id = ?", (game_id,))
+            self.connection.execute("DELETE FROM games WHERE id = ?", (game_id,))
+
+    def replay(self, filename):
+        """
+        Воспроизводит партию и возвращает ключи всех ее позиций.
+
+        Параметры:
+            filename (str): Путь к файлу партии.
+
+        Возвращает:
+            list: Ключи позиций по номерам полуходов, начиная с начальной позиции.
+        """
+        turn, move_count, moves = read_save_file(filename)
+        game = Game()
+        keys = [to_sqlite_key(game.position_key())]
+        for piece, start, end in moves:
+            game.board.make_move(start, end)
+            game.turn = 'black' if game.turn == 'white' else 'white'
+            keys.append(to_sqlite_key(game.position_key()))
+        return keys
+
+    def query(self, position, turn='white'):
+        """
+        Находит партии, в которых встречалась позиция.
+
+        Параметры:
+            position: Позиция в нотации FEN (str), объект Game или объект Board.
+            turn (str): Очередь хода, если позиция задана объектом Board.
+
+        Возвращает:
+            list: Список кортежей (путь к файлу партии, номер полухода).
+        """
+        if isinstance(position, str):
+            game = Game()
+            game.set_fen(position)
+            key = game.position_key()
+        elif isinstance(position, Board):
+            key = position.hash ^ (ZOBRIST_BLACK_TO_MOVE if turn == 'black' else 0)
+        else:
+            key = position.position_key()
+        return self.connection.execute(
+            "SELECT games.path, positions.ply FROM positions JOIN games ON games.id = positions.game_id "
+            "WHERE positions.hash = ? ORDER BY games.path, positions.ply",
+            (to_sqlite_key(key),)
+        ).fetchall()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Индекс позиций архива партий.")
+    parser.add_argument('index', help="Путь к файлу индекса SQLite")
+    commands = parser.add_subparsers(dest='command', required=True)
+    update = commands.add_parser('update', help="Проиндексировать новые и изменившиеся партии")
+    update.add_argument('archive', help="Каталог с файлами партий или путь к файлу партии")
+    query = commands.add_parser('query', help="Найти партии, в которых встречалась позиция")
+    query.add_argument('fen', help="Позиция в нотации FEN")
+    args = parser.parse_args()
+
+    index = PositionIndex(args.index)
+    try:
+        if args.command == 'update':
+            stats = index.update(args.archive)
+            print(f"Проиндексировано: {stats['indexed']}, без изменений: {stats['unchanged']}, "
+                  f"ошибок: {stats['failed']}, удалено: {stats['removed']}")
+        else:
+            matches = index.query(args.fen)
+            for path, ply in matches:
+                print(f"{path}\t{ply}")
+            if not matches:
+                print("Позиция не найдена.")
+    finally:
+        index.close()
+
+
+if __name__ == "__main__":
+    main()